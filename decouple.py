@@ -1,24 +1,24 @@
 # coding: utf-8
+import errno
 import os
 import sys
+import re
 import string
-from shlex import shlex
-from io import open
-from collections import OrderedDict
-from distutils.util import strtobool
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from configparser import ConfigParser, Error as ConfigParserError, InterpolationError
 
-# Useful for very coarse version differentiation.
-PY3 = sys.version_info[0] == 3
-
-if PY3:
-    from configparser import ConfigParser
-    text_type = str
-else:
-    from ConfigParser import SafeConfigParser as ConfigParser
-    text_type = unicode
+text_type = str
 
 DEFAULT_ENCODING = 'UTF-8'
 
+# Read config files in large chunks, typically in a single read call.
+_READ_BUFFERING = 128 * 1024
+
+# Errors opening a file for writing that still allow reading it.
+_READ_ONLY_ERRNOS = (errno.EACCES, errno.EPERM, errno.EROFS)
+
 class UndefinedValueError(Exception):
     pass
 
@@ -36,48 +36,142 @@ class Undefined(object):
 # Reference instance to represent undefined values
 undefined = Undefined()
 
+# Private marker for options missing from os.environ
+_MISSING = object()
+
+# Values accepted when casting to bool, as ConfigParser does.
+# An empty string means False.
+_TRUE = frozenset({'y', 'yes', 't', 'true', 'on', '1'})
+_FALSE = frozenset({'n', 'no', 'f', 'false', 'off', '0', ''})
+
+# Characters with a special meaning to shlex: quotes, escape and comments.
+_SHLEX_SPECIAL = re.compile(r'[\'"\\#]')
+
+# A `key=value` line from a .env file, skipping blanks and comments.
+_ENV_LINE = re.compile(r'^[^\S\n]*([^\s#=][^=\n]*)?=([^\n]*)$', re.MULTILINE)
+
+
+def _file_stamp(source):
+    """
+    Return a stamp identifying the current content of source, or None if it
+    can't be stat'ed.
+
+    The inode and ctime catch rewrites that keep size and mtime, like
+    `cp -p`, `rsync -t` or a file renamed into place.
+    """
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_ctime_ns, st.st_size
+
+
+def _cached_parse(parse, source, encoding, stamp):
+    """
+    Parse source through the cached parse function, keyed on its stamp so
+    changes on disk invalidate the cached result.
+    """
+    if stamp is None:
+        return parse.__wrapped__(source, encoding)
+    return parse(os.path.abspath(source), encoding, stamp)
+
+
+@lru_cache(maxsize=32)
+def _parse_ini(source, encoding, stamp=None):
+    parser = ConfigParser()
+    with open(source, encoding=encoding, buffering=_READ_BUFFERING) as file_:
+        parser.read_file(file_)
+    return parser
+
+
+@lru_cache(maxsize=32)
+def _parse_env(source, encoding, stamp=None):
+    with open(source, encoding=encoding, buffering=_READ_BUFFERING) as file_:
+        content = file_.read()
+
+    data = {}
+    for k, v in _ENV_LINE.findall(content):
+        v = v.strip()
+        if len(v) >= 2 and v[0] == v[-1] and v[0] in '\'"':
+            v = v.strip('\'"')
+        data[k.strip()] = v
+
+    return data
+
+
+def _cast_boolean(value):
+    """
+    Helper to convert config values to boolean as ConfigParser do.
+    """
+    if value is True or value is False:
+        return value
+
+    value = (value if isinstance(value, str) else str(value)).lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError('invalid truth value {!r}'.format(value))
+
+
+def _cast_do_nothing(value):
+    return value
+
+
+# Casts replaced by a helper that better suits config values.
+_CAST_SPECIAL = {bool: _cast_boolean}
+
+
+def _resolve_cast(cast):
+    """
+    Return the callable that actually performs the requested cast.
+    """
+    if cast is undefined:
+        return _cast_do_nothing
+    try:
+        return _CAST_SPECIAL.get(cast, cast)
+    except TypeError:
+        # Unhashable casts are never special.
+        return cast
+
 
 class Config(object):
     """
     Handle .env file format used by Foreman.
     """
 
-    def __init__(self, repository):
-        self.repository = repository
+    # Snapshot os.environ into a plain dict at init for faster lookups.
+    # Unsafe if the environment is changed afterwards: those changes are
+    # not seen.
+    FROZEN_ENV = False
 
-    def _cast_boolean(self, value):
-        """
-        Helper to convert config values to boolean as ConfigParser do.
-        """
-        value = str(value)
-        return bool(value) if value == '' else bool(strtobool(value))
+    # None means os.environ, looked up on every call.
+    _env = None
 
-    @staticmethod
-    def _cast_do_nothing(value):
-        return value
+    def __init__(self, repository):
+        self.repository = repository
+        if self.FROZEN_ENV:
+            # The repository must not see newer variables either.
+            self._env = repository._env = dict(os.environ)
 
     def get(self, option, default=undefined, cast=undefined):
         """
         Return the value for option or default if defined.
         """
 
-        # We can't avoid __contains__ because value may be empty.
-        if option in os.environ:
-            value = os.environ[option]
-        elif option in self.repository:
-            value = self.repository[option]
-        else:
-            if isinstance(default, Undefined):
-                raise UndefinedValueError('{} not found. Declare it as envvar or define a default value.'.format(option))
+        # Compare against a marker because value may be empty.
+        env = self._env if self._env is not None else os.environ
+        value = env.get(option, _MISSING)
+        if value is _MISSING:
+            if option in self.repository:
+                value = self.repository[option]
+            else:
+                if default is undefined:
+                    raise UndefinedValueError('{} not found. Declare it as envvar or define a default value.'.format(option))
 
-            value = default
-
-        if isinstance(cast, Undefined):
-            cast = self._cast_do_nothing
-        elif cast is bool:
-            cast = self._cast_boolean
+                value = default
 
-        return cast(value)
+        return _resolve_cast(cast)(value)
 
     def __call__(self, *args, **kwargs):
         """
@@ -102,16 +196,11 @@ class WritableConfig(Config):
         if option in self.repository:
             value = self.repository[option]
         else:
-            if isinstance(default, Undefined):
+            if default is undefined:
                 raise UndefinedValueError('{} not found. Declare it as envvar or define a default value.'.format(option))
             value = default
 
-        if isinstance(cast, Undefined):
-            cast = self._cast_do_nothing
-        elif cast is bool:
-            cast = self._cast_boolean
-
-        return cast(value)
+        return _resolve_cast(cast)(value)
 
     def __getitem__(self, key):
         return self.get(key)
@@ -128,9 +217,23 @@ class WritableConfig(Config):
     def __delattr__(self, item):
         self.repository.__delattr__(item)
 
+    def __enter__(self):
+        self.repository.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.repository.__exit__(*exc_info)
+
+    def update(self, mapping):
+        self.repository.update(mapping)
+
 
 class RepositoryEmpty(object):
-    def __init__(self, source='', encoding=DEFAULT_ENCODING):
+    # Environment checked before the file: os.environ when None, or the
+    # snapshot of a frozen Config.
+    _env = None
+
+    def __init__(self, source='', encoding=DEFAULT_ENCODING, auto_reload=False):
         pass
 
     def __contains__(self, key):
@@ -146,17 +249,61 @@ class RepositoryIni(RepositoryEmpty):
     """
     SECTION = 'settings'
 
-    def __init__(self, source, encoding=DEFAULT_ENCODING):
-        self.parser = ConfigParser()
-        with open(source, encoding=encoding) as file_:
-            self.parser.read_file(file_)
+    def __init__(self, source, encoding=DEFAULT_ENCODING, auto_reload=False):
+        self.source = source
+        self.encoding = encoding
+        self.auto_reload = auto_reload
+        self._load()
+
+    # Failures that leave the last good data in place on reload.
+    _reload_errors = (OSError, ValueError, ConfigParserError)
+
+    def _load(self):
+        stamp = _file_stamp(self.source)
+        # The parser is shared between instances, treat it as read-only.
+        parser = _cached_parse(_parse_ini, self.source, self.encoding, stamp)
+        data = self._snapshot(parser)
+        self._stamp, self.parser, self._data = stamp, parser, data
+        self._optionxform = parser.optionxform
+
+    def _check_fresh(self):
+        if _file_stamp(self.source) != self._stamp:
+            try:
+                self._load()
+            except self._reload_errors:
+                # Missing or half-written: retried on the next lookup.
+                pass
+
+    def _snapshot(self, parser=None):
+        """
+        Flatten SECTION into a dict, interpolating every value once.
+        """
+        parser = self.parser if parser is None else parser
+        if self.SECTION not in parser:
+            return {}
+
+        data = {}
+        section = parser[self.SECTION]
+        for option in section:
+            try:
+                data[option] = section[option]
+            except InterpolationError:
+                # Let __getitem__ raise it only when the option is used.
+                data[option] = _MISSING
+        return data
 
     def __contains__(self, key):
-        return (key in os.environ or
-                self.parser.has_option(self.SECTION, key))
+        if self.auto_reload:
+            self._check_fresh()
+        env = self._env if self._env is not None else os.environ
+        return (key in env or
+                self._optionxform(key) in self._data)
 
     def __getitem__(self, key):
-        return self.parser.get(self.SECTION, key)
+        value = self._data.get(self._optionxform(key), _MISSING)
+        if value is _MISSING:
+            return self.parser.get(self.SECTION, key)
+        return value
 
 
 class WritableRepositoryIni(RepositoryIni):
@@ -170,11 +317,27 @@ class WritableRepositoryIni(RepositoryIni):
         self.encoding = encoding
         self.cast_inputs = cast_inputs
 
-        if not os.path.exists(self.source):
-            from pathlib import Path
-            Path(self.source).touch()
-
-        super(WritableRepositoryIni, self).__init__(self.source, encoding)
+        # Don't go through the parse cache: this parser gets modified.
+        # Opening in append mode creates a missing file in the same call.
+        self.parser = ConfigParser()
+        try:
+            file_ = open(self.source, 'a+', encoding=encoding)
+        except OSError as error:
+            if not (isinstance(error, PermissionError) or error.errno in _READ_ONLY_ERRNOS):
+                raise
+            # Read-only files can still be loaded, only writes will fail.
+            try:
+                file_ = open(self.source, encoding=encoding)
+            except OSError:
+                raise error
+        with file_:
+            file_.seek(0)
+            self.parser.read_file(file_)
+        self._optionxform = self.parser.optionxform
+        # The snapshot is rebuilt lazily after each change.
+        self._data = None
+        self._dirty = False
+        self._batching = 0
 
         if create_section and self.SECTION not in self.parser.sections():
             self.parser.add_section(self.SECTION)
@@ -183,32 +346,67 @@ class WritableRepositoryIni(RepositoryIni):
     def _save(self):
         with open(self.source, 'w', encoding=self.encoding) as file_:
             self.parser.write(file_)
+        self._dirty = False
+
+    def _changed(self):
+        self._data = None
+        self._dirty = True
+        if not self._batching:
+            self._save()
+
+    def __enter__(self):
+        """
+        Defer saving changes to disk until the outermost block exits.
+        """
+        self._batching += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._batching -= 1
+        if not self._batching and self._dirty:
+            self._save()
+
+    def update(self, mapping):
+        """
+        Set all items from mapping, writing the file only once.
+        """
+        with self:
+            for key, value in mapping.items():
+                self[key] = value
+
+    def _fresh_data(self):
+        if self._data is None:
+            self._data = self._snapshot()
+        return self._data
 
     def __contains__(self, key):
         key = str(key) if self._istype(key, self.cast_inputs) else key
-        return self.parser.has_option(self.SECTION, key)
+        return self._optionxform(key) in self._fresh_data()
 
     def __getitem__(self, key):
         key = str(key) if self._istype(key, self.cast_inputs) else key
-        return self.parser.get(self.SECTION, key)
+        value = self._fresh_data().get(self._optionxform(key), _MISSING)
+        if value is _MISSING:
+            return self.parser.get(self.SECTION, key)
+        return value
 
     def __setitem__(self, key, value):
         key = str(key) if self._istype(key, self.cast_inputs) else key
         value = str(value) if self._istype(value, self.cast_inputs) else value
 
         self.parser.set(self.SECTION, key, value)
-        self._save()
+        self._changed()
 
     def __delitem__(self, key):
         key = str(key) if self._istype(key, self.cast_inputs) else key
 
         self.parser.remove_option(self.SECTION, key)
-        self._save()
+        self._changed()
 
     def __delattr__(self, item):
         if item.upper() == 'SECTION':
             self.parser.remove_section(self.SECTION)
-            self._save()
+            self._changed()
 
     # isinstance takes bool as int
     @classmethod
@@ -221,23 +419,33 @@ class RepositoryEnv(RepositoryEmpty):
     """
     Retrieves option keys from .env files with fall back to os.environ.
     """
-    def __init__(self, source, encoding=DEFAULT_ENCODING):
-        self.data = {}
-
-        with open(source, encoding=encoding) as file_:
-            for line in file_:
-                line = line.strip()
-                if not line or line.startswith('#') or '=' not in line:
-                    continue
-                k, v = line.split('=', 1)
-                k = k.strip()
-                v = v.strip()
-                if len(v) >= 2 and ((v[0] == "'" and v[-1] == "'") or (v[0] == '"' and v[-1] == '"')):
-                    v = v.strip('\'"')
-                self.data[k] = v
+    def __init__(self, source, encoding=DEFAULT_ENCODING, auto_reload=False):
+        self.source = source
+        self.encoding = encoding
+        self.auto_reload = auto_reload
+        self._load()
+
+    # Failures that leave the last good data in place on reload.
+    _reload_errors = (OSError, ValueError)
+
+    def _load(self):
+        stamp = _file_stamp(self.source)
+        data = dict(_cached_parse(_parse_env, self.source, self.encoding, stamp))
+        self._stamp, self.data = stamp, data
+
+    def _check_fresh(self):
+        if _file_stamp(self.source) != self._stamp:
+            try:
+                self._load()
+            except self._reload_errors:
+                # Missing or half-written: retried on the next lookup.
+                pass
 
     def __contains__(self, key):
-        return key in os.environ or key in self.data
+        if self.auto_reload:
+            self._check_fresh()
+        env = self._env if self._env is not None else os.environ
+        return key in env or key in self.data
 
     def __getitem__(self, key):
         return self.data[key]
@@ -252,43 +460,101 @@ class AutoConfig(object):
     search_path : str, optional
         Initial search path. If empty, the default search path is the
         caller's path.
+    auto_reload : bool, optional
+        Reload the config file when it changes on disk. This costs one stat
+        call per lookup, which is still far cheaper than parsing the file.
+        If the file goes missing or can't be parsed, the last good values
+        are kept. The default is False.
 
     """
-    SUPPORTED = OrderedDict([
+    SUPPORTED = (
         ('settings.ini', RepositoryIni),
         ('.env', RepositoryEnv),
-    ])
+    )
 
     encoding = DEFAULT_ENCODING
 
-    def __init__(self, search_path=None):
+    # Shared by all instances: serializes the first load and remembers which
+    # file was found for each search path.
+    _load_lock = threading.Lock()
+    _filename_cache = {}
+
+    def __init__(self, search_path=None, auto_reload=False):
         self.search_path = search_path
+        self.auto_reload = auto_reload
         self.config = None
+        # Subclasses may still set SUPPORTED as a {name: Repository} mapping.
+        supported = self.SUPPORTED
+        if isinstance(supported, Mapping):
+            supported = supported.items()
+        self._supported = tuple(supported)
+        # Compared against directory entries, which may differ in case on
+        # case-insensitive filesystems.
+        self._names = frozenset(os.path.normcase(configfile) for configfile, _ in self._supported)
 
     def _find_file(self, path):
-        # look for all files in the current path
-        for configfile in self.SUPPORTED:
-            filename = os.path.join(path, configfile)
-            if os.path.isfile(filename):
-                return filename
+        root = os.path.abspath(os.sep)
+
+        while True:
+            # look for all files in the current path
+            found = self._scan_dir(path, self._names)
+            for configfile, Repository in self._supported:
+                if os.path.normcase(configfile) in found:
+                    return os.path.join(path, configfile), Repository
+
+            # search the parent
+            parent = os.path.dirname(path)
+            if not parent or parent == root:
+                # reached root without finding any files.
+                return '', RepositoryEmpty
+            path = parent
 
-        # search the parent
-        parent = os.path.dirname(path)
-        if parent and parent != os.path.abspath(os.sep):
-            return self._find_file(parent)
+    @staticmethod
+    def _scan_dir(path, names):
+        """
+        Return which of names are files in path, listing the directory once.
+        Both names and the result are normalized with os.path.normcase.
+        """
+        found = set()
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    name = os.path.normcase(entry.name)
+                    if name not in names:
+                        continue
+                    try:
+                        if entry.is_file():
+                            found.add(name)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return found
+
+    def _cached_find_file(self, path):
+        """
+        Like _find_file, but reuse the file found earlier for the same path.
 
-        # reached root without finding any files.
-        return ''
+        Only hits are cached, and a cached file is dropped once it is gone.
+        A config file created later closer to path isn't noticed while the
+        cached one still exists.
+        """
+        key = (path, self._supported)
+        found = self._filename_cache.get(key)
+        if found is None or not os.path.isfile(found[0]):
+            found = self._find_file(path)
+            if found[0]:
+                self._filename_cache[key] = found
+        return found
 
     def _load(self, path):
         # Avoid unintended permission errors
         try:
-            filename = self._find_file(os.path.abspath(path))
+            filename, Repository = self._cached_find_file(os.path.abspath(path))
         except Exception:
-            filename = ''
-        Repository = self.SUPPORTED.get(os.path.basename(filename), RepositoryEmpty)
+            filename, Repository = '', RepositoryEmpty
 
-        self.config = Config(Repository(filename, encoding=self.encoding))
+        self.config = Config(Repository(filename, encoding=self.encoding, auto_reload=self.auto_reload))
 
     def _caller_path(self):
         # MAGIC! Get the caller's module path.
@@ -297,10 +563,12 @@ class AutoConfig(object):
         return path
 
     def __call__(self, *args, **kwargs):
-        if not self.config:
-            self._load(self.search_path or self._caller_path())
+        if self.config is None:
+            with self._load_lock:
+                if self.config is None:
+                    self._load(self.search_path or self._caller_path())
 
-        return self.config(*args, **kwargs)
+        return self.config.get(*args, **kwargs)
 
 
 class CustomConfig(AutoConfig):
@@ -319,21 +587,23 @@ class CustomConfig(AutoConfig):
     section: str, optional
         For ini files, section name that should be loaded. The default is 
         "settings".
+    auto_reload : bool, optional
+        Reload the config file when it changes on disk. The default is False.
 
     """
     def __init__(self, config_filename, repository_class, search_path=None,
-            section=None):
+            section=None, auto_reload=False):
 
         if repository_class not in [RepositoryEnv, RepositoryIni]:
             raise UnsupportedParser("Unsupported Config Parser, should be : RepositoryEnv or RepositoryIni")
-        self.SUPPORTED = {
-            config_filename: repository_class
-        }
+        self.SUPPORTED = (
+            (config_filename, repository_class),
+        )
 
         if section and repository_class == RepositoryIni:
             repository_class.SECTION = section
 
-        super(CustomConfig, self).__init__(search_path)
+        super(CustomConfig, self).__init__(search_path, auto_reload)
 
 
 # A pré-instantiated AutoConfig to improve decouple's usability
@@ -359,11 +629,18 @@ class Csv(object):
         self.delimiter = delimiter
         self.strip = strip
         self.post_process = post_process
+        self._tokens = re.compile('[^{}]+'.format(re.escape(delimiter))) if delimiter else None
 
     def __call__(self, value):
         """The actual transformation"""
         transform = lambda s: self.cast(s.strip(self.strip))
 
+        if self._tokens is not None and not _SHLEX_SPECIAL.search(value):
+            # Nothing for shlex to unquote or unescape, a plain split will do.
+            return self.post_process(transform(s) for s in self._tokens.findall(value))
+
+        from shlex import shlex
+
         splitter = shlex(value, posix=True)
         splitter.whitespace = self.delimiter
         splitter.whitespace_split = True
@@ -391,10 +668,20 @@ class Choices(object):
         self._valid_values.extend(self.flat)
         self._valid_values.extend([value for value, _ in self.choices])
 
+        try:
+            self._valid_set = frozenset(self._valid_values)
+        except TypeError:
+            # Unhashable choices, fall back to scanning the list.
+            self._valid_set = self._valid_values
+
 
     def __call__(self, value):
         transform = self.cast(value)
-        if transform not in self._valid_values:
+        try:
+            valid = transform in self._valid_set
+        except TypeError:
+            valid = transform in self._valid_values
+        if not valid:
             raise ValueError((
                     'Value not in list: {!r}; valid values are {!r}'
                 ).format(value, self._valid_values))
@@ -14,6 +14,7 @@ setup(name='python-decouple',
       py_modules=['decouple'],
       zip_safe=False,
       platforms='any',
+      python_requires='>=3.6',
       include_package_data=True,
       classifiers=[
           'Development Status :: 5 - Production/Stable',
@@ -1,8 +1,18 @@
 # coding: utf-8
 import os
+from collections import OrderedDict
 import pytest
-from mock import patch, mock_open
-from decouple import AutoConfig, UndefinedValueError, RepositoryEmpty, DEFAULT_ENCODING, PY3
+from mock import patch, mock_open, MagicMock
+from decouple import AutoConfig, UndefinedValueError, RepositoryEmpty, RepositoryEnv, DEFAULT_ENCODING, _parse_ini, _parse_env, _READ_BUFFERING
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    # Mocked lookups and reads must not leak into other tests.
+    AutoConfig._filename_cache.clear()
+    _parse_ini.cache_clear()
+    _parse_env.cache_clear()
 
 
 def test_autoconfig_env():
@@ -42,7 +52,7 @@ def test_autoconfig_none():
     os.environ['KeyFallback'] = 'On'
     config = AutoConfig()
     path = os.path.join(os.path.dirname(__file__), 'autoconfig', 'none')
-    with patch('os.path.isfile', return_value=False):
+    with patch('os.scandir'):
         assert True is config('KeyFallback', cast=bool)
     del os.environ['KeyFallback']
 
@@ -50,7 +60,7 @@ def test_autoconfig_none():
 def test_autoconfig_exception():
     os.environ['KeyFallback'] = 'On'
     config = AutoConfig()
-    with patch('os.path.isfile', side_effect=Exception('PermissionDenied')):
+    with patch('os.scandir', side_effect=Exception('PermissionDenied')):
         assert True is config('KeyFallback', cast=bool)
     del os.environ['KeyFallback']
 
@@ -58,7 +68,11 @@ def test_autoconfig_exception():
 def test_autoconfig_is_not_a_file():
     os.environ['KeyFallback'] = 'On'
     config = AutoConfig()
-    with patch('os.path.isfile', return_value=False):
+    entry = MagicMock()
+    entry.name = 'settings.ini'
+    entry.is_file.return_value = False
+    with patch('os.scandir') as scandir:
+        scandir.return_value.__enter__.return_value = [entry]
         assert True is config('KeyFallback', cast=bool)
     del os.environ['KeyFallback']
 
@@ -86,7 +100,7 @@ def test_autoconfig_ini_default_encoding():
         with patch('decouple.open', mock_open(read_data='')) as mopen:
             assert config.encoding == DEFAULT_ENCODING
             assert 'ENV' == config('KEY', default='ENV')
-            mopen.assert_called_once_with(filename, encoding=DEFAULT_ENCODING)
+            mopen.assert_called_once_with(filename, encoding=DEFAULT_ENCODING, buffering=_READ_BUFFERING)
 
 def test_autoconfig_env_default_encoding():
     config = AutoConfig()
@@ -96,4 +110,77 @@ def test_autoconfig_env_default_encoding():
         with patch('decouple.open', mock_open(read_data='')) as mopen:
             assert config.encoding == DEFAULT_ENCODING
             assert 'ENV' == config('KEY', default='ENV')
-            mopen.assert_called_once_with(filename, encoding=DEFAULT_ENCODING)
+            mopen.assert_called_once_with(filename, encoding=DEFAULT_ENCODING, buffering=_READ_BUFFERING)
+
+
+def test_autoconfig_filename_cache():
+    path = os.path.join(os.path.dirname(__file__), 'autoconfig', 'env', 'project')
+    assert 'ENV' == AutoConfig(path)('KEY')
+
+    with patch('os.scandir') as scandir:
+        assert 'ENV' == AutoConfig(path)('KEY')
+        assert not scandir.called
+
+
+def test_autoconfig_auto_reload(tmp_path):
+    envfile = tmp_path / '.env'
+    envfile.write_text(u'KEY=first\n')
+    config = AutoConfig(str(tmp_path), auto_reload=True)
+    assert 'first' == config('KEY')
+
+    envfile.write_text(u'KEY=second value\n')
+    assert 'second value' == config('KEY')
+
+
+def test_autoconfig_no_auto_reload(tmp_path):
+    envfile = tmp_path / '.env'
+    envfile.write_text(u'KEY=first\n')
+    config = AutoConfig(str(tmp_path))
+    assert 'first' == config('KEY')
+
+    envfile.write_text(u'KEY=second value\n')
+    assert 'first' == config('KEY')
+
+
+def test_autoconfig_auto_reload_keeps_last_good_values(tmp_path):
+    inifile = tmp_path / 'settings.ini'
+    inifile.write_text(u'[settings]\nKEY=first\n')
+    config = AutoConfig(str(tmp_path), auto_reload=True)
+    assert 'first' == config('KEY')
+
+    inifile.rename(tmp_path / 'moved.ini')
+    assert 'first' == config('KEY', default='default')
+    assert 'first' == config('KEY', default='default')
+
+    inifile.write_text(u'no section header\n')
+    assert 'first' == config('KEY')
+
+    inifile.write_text(u'[settings]\nKEY=second value\n')
+    assert 'second value' == config('KEY')
+
+
+def test_autoconfig_filename_cache_skips_misses(tmp_path):
+    assert 'default' == AutoConfig(str(tmp_path))('KEY', default='default')
+
+    (tmp_path / '.env').write_text(u'KEY=created\n')
+    assert 'created' == AutoConfig(str(tmp_path))('KEY', default='default')
+
+
+def test_autoconfig_find_file_case_insensitive():
+    entry = MagicMock()
+    entry.name = '.ENV'
+    entry.is_file.return_value = True
+    with patch('os.path.normcase', side_effect=lambda s: s.lower()):
+        config = AutoConfig()
+        with patch('os.scandir') as scandir:
+            scandir.return_value.__enter__.return_value = [entry]
+            path = os.path.abspath(os.path.join('project', 'dir'))
+            assert (os.path.join(path, '.env'), RepositoryEnv) == config._find_file(path)
+
+
+def test_autoconfig_supported_as_mapping():
+    class MappingConfig(AutoConfig):
+        SUPPORTED = OrderedDict([('.env', RepositoryEnv)])
+
+    path = os.path.join(os.path.dirname(__file__), 'autoconfig', 'env', 'custom-path')
+    assert 'CUSTOMPATH' == MappingConfig(path)('KEY')
@@ -1,20 +1,11 @@
 # coding: utf-8
 import os
-import sys
+from io import StringIO
 from mock import patch
 import pytest
 from decouple import Config, RepositoryEnv, UndefinedValueError
 
 
-# Useful for very coarse version differentiation.
-PY3 = sys.version_info[0] == 3
-
-if PY3:
-    from io import StringIO
-else:
-    from io import BytesIO as StringIO
-
-
 ENVFILE = '''
 KeyTrue=True
 KeyOne=1
@@ -128,3 +119,64 @@ def test_env_with_quote(config):
     assert '"text' == config('KeyWithDoubleQuoteBegin')
     assert '"' == config('KeyIsDoubleQuote')
     assert "'" == config('KeyIsSingleQuote')
+
+
+def test_env_parse_cache(tmp_path):
+    envfile = tmp_path / '.env'
+    envfile.write_text(u'Key=first\n')
+    assert 'first' == Config(RepositoryEnv(str(envfile)))('Key')
+
+    with patch('decouple.open') as mopen:
+        assert 'first' == Config(RepositoryEnv(str(envfile)))('Key')
+        assert not mopen.called
+
+    envfile.write_text(u'Key=second value\n')
+    assert 'second value' == Config(RepositoryEnv(str(envfile)))('Key')
+
+
+def test_env_frozen_os_environ():
+    os.environ['KeyFrozen'] = 'before'
+    with patch.object(Config, 'FROZEN_ENV', True):
+        with patch('decouple.open', return_value=StringIO(ENVFILE), create=True):
+            config = Config(RepositoryEnv('.env'))
+    os.environ['KeyFrozen'] = 'after'
+    assert 'before' == config('KeyFrozen')
+    del os.environ['KeyFrozen']
+
+
+def test_env_frozen_os_environ_ignores_new_variables():
+    with patch.object(Config, 'FROZEN_ENV', True):
+        with patch('decouple.open', return_value=StringIO(ENVFILE), create=True):
+            config = Config(RepositoryEnv('.env'))
+    os.environ['KeyAddedLater'] = 'after'
+    assert 'default' == config('KeyAddedLater', default='default')
+    del os.environ['KeyAddedLater']
+
+
+def test_env_config_subclass_without_super_init():
+    class MyConfig(Config):
+        def __init__(self, repository):
+            self.repository = repository
+
+    with patch('decouple.open', return_value=StringIO(ENVFILE), create=True):
+        config = MyConfig(RepositoryEnv('.env'))
+    assert 'text' == config('IgnoreSpace')
+
+
+def test_env_parse_cache_same_size_and_mtime(tmp_path):
+    envfile = tmp_path / '.env'
+    envfile.write_text(u'Key=first\n')
+    assert 'first' == Config(RepositoryEnv(str(envfile)))('Key')
+
+    st = os.stat(str(envfile))
+    replacement = tmp_path / 'new.env'
+    replacement.write_text(u'Key=other\n')
+    os.utime(str(replacement), ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(str(replacement), str(envfile))
+    assert 'other' == Config(RepositoryEnv(str(envfile)))('Key')
+
+
+def test_env_patched_os_environ(config):
+    with patch('os.environ', {'KeyOnlyInPatch': 'yes'}):
+        assert 'yes' == config('KeyOnlyInPatch', default='default')
+        assert 'KeyOnlyInPatch' in config.repository
@@ -101,3 +101,12 @@ def test_cast_to_int_with_booth_flat_list_and_django_like_choices():
 
     with pytest.raises(ValueError):
         choices('1')
+
+
+def test_unhashable_values():
+    """Unhashable cast results are still validated."""
+    choices = Choices([['a', 'b'], ['c']], cast=lambda s: s.split(','))
+    assert ['a', 'b'] == choices('a,b')
+
+    with pytest.raises(ValueError):
+        choices('d')
@@ -29,3 +29,12 @@ def test_csv_quoted_parse():
     assert ['foo', "'bar, baz'", "'qux"] == csv(''' foo ,"'bar, baz'", "'qux"''')
 
     assert ['foo', '"bar, baz"', '"qux'] == csv(""" foo ,'"bar, baz"', '"qux'""")
+
+
+def test_csv_unquoted_parse():
+    csv = Csv()
+    assert ['foo', 'bar'] == csv('foo,,bar,')
+    assert [] == csv('')
+
+    csv = Csv(delimiter=',;', strip='')
+    assert ['foo', ' bar', 'baz'] == csv('foo, bar;baz')
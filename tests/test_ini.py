@@ -1,18 +1,9 @@
 # coding: utf-8
 import os
-import sys
+from io import StringIO
 from mock import patch, mock_open
 import pytest
-from decouple import Config, RepositoryIni, UndefinedValueError
-
-# Useful for very coarse version differentiation.
-PY3 = sys.version_info[0] == 3
-
-if PY3:
-    from io import StringIO
-else:
-    from io import BytesIO as StringIO
-
+from decouple import Config, RepositoryIni, UndefinedValueError, InterpolationError
 
 
 INIFILE = '''
@@ -121,3 +112,28 @@ def test_ini_undefined_but_present_in_os_environ(config):
 
 def test_ini_empty_string_means_false(config):
     assert False is config('KeyEmpty', cast=bool)
+
+
+def test_ini_interpolation_error_on_use():
+    inifile = '[settings]\nKeyOk=ok\nKeyBroken=%(Missing)s\n'
+    with patch('decouple.open', return_value=StringIO(inifile), create=True):
+        config = Config(RepositoryIni('settings.ini'))
+
+    assert 'ok' == config('KeyOk')
+    with pytest.raises(InterpolationError):
+        config('KeyBroken')
+
+
+def test_ini_frozen_os_environ_ignores_new_variables():
+    with patch.object(Config, 'FROZEN_ENV', True):
+        with patch('decouple.open', return_value=StringIO(INIFILE), create=True):
+            config = Config(RepositoryIni('settings.ini'))
+    os.environ['KeyAddedLater'] = 'after'
+    assert 'default' == config('KeyAddedLater', default='default')
+    del os.environ['KeyAddedLater']
+
+
+def test_ini_bool_surrounding_whitespace_is_invalid(config):
+    for value in ('  ', ' yes ', 'true\t'):
+        with pytest.raises(ValueError):
+            config('UndefinedKey', default=value, cast=bool)
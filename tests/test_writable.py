@@ -0,0 +1,70 @@
+# coding: utf-8
+import errno
+from io import StringIO
+from mock import patch
+import pytest
+from decouple import WritableConfig
+
+
+def test_writable_creates_file(tmp_path):
+    inifile = tmp_path / 'settings.ini'
+    config = WritableConfig(str(inifile))
+    assert inifile.exists()
+    assert '[default]' in inifile.read_text()
+
+    config['Key'] = 'value'
+    assert 'value' == config('Key')
+    assert 'key = value' in inifile.read_text()
+
+
+def test_writable_reads_existing_file(tmp_path):
+    inifile = tmp_path / 'settings.ini'
+    inifile.write_text(u'[default]\nKey=value\n')
+    config = WritableConfig(str(inifile))
+    assert 'value' == config('Key')
+
+    del config['Key']
+    assert 'Key' not in config
+    assert 'key' not in inifile.read_text()
+
+
+def test_writable_batch_saves_once(tmp_path):
+    inifile = tmp_path / 'settings.ini'
+    config = WritableConfig(str(inifile))
+
+    with patch.object(config.repository, '_save', wraps=config.repository._save) as save:
+        with config:
+            config['KeyA'] = 'a'
+            config['KeyB'] = 'b'
+            assert 'a' == config('KeyA')
+            assert not save.called
+        assert 1 == save.call_count
+
+        config.update({'KeyC': 'c', 'KeyD': 'd'})
+        assert 2 == save.call_count
+
+    assert 'keyd = d' in inifile.read_text()
+
+
+@pytest.mark.parametrize('error', [
+    PermissionError(errno.EACCES, 'Permission denied'),
+    OSError(errno.EROFS, 'Read-only file system'),
+])
+def test_writable_reads_read_only_file(tmp_path, error):
+    inifile = tmp_path / 'settings.ini'
+    inifile.write_text(u'[default]\nKey=value\n')
+    readonly = StringIO(u'[default]\nKey=value\n')
+
+    with patch('decouple.open', side_effect=[error, readonly]):
+        config = WritableConfig(str(inifile))
+    assert 'value' == config('Key')
+
+
+def test_writable_missing_file_in_read_only_dir(tmp_path):
+    inifile = tmp_path / 'settings.ini'
+    error = OSError(errno.EROFS, 'Read-only file system')
+
+    with patch('decouple.open', side_effect=[error, FileNotFoundError()]):
+        with pytest.raises(OSError) as excinfo:
+            WritableConfig(str(inifile))
+    assert excinfo.value is error